@@ -1,8 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel
-from typing import List
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from datetime import datetime
 from ...auth.dependencies import get_current_user
+from ...database import get_db
 from ...services.freeswitch import FreeSwitchService
+from ..ranges import resolve_date_range
 
 router = APIRouter(tags=["calls"])
 
@@ -40,16 +45,25 @@ async def hangup_call(call_id: str, current_user: dict = Depends(get_current_use
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.get("/history")
-async def get_call_history(current_user: dict = Depends(get_current_user)):
-    # Placeholder implementation
-    return {
-        "calls": [
-            {
-                "call_id": "call-123",
-                "from_number": "+1234567890",
-                "to_number": "+0987654321",
-                "status": "completed",
-                "duration": 120
-            }
-        ]
-    }
\ No newline at end of file
+def get_call_history(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    limit: int = Query(50, ge=1, le=500),
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    # calls is partitioned by month on start_time; always bounding it keeps
+    # the scan to the partitions covering the requested range
+    start, end = resolve_date_range(start_date, end_date, 30)
+
+    rows = db.execute(
+        text(
+            "SELECT c.call_id, c.from_number, c.to_number, c.status, c.start_time, c.duration "
+            "FROM calls c JOIN users u ON u.id = c.user_id "
+            "WHERE u.username = :username "
+            "AND c.start_time >= :start AND c.start_time < :end "
+            "ORDER BY c.start_time DESC LIMIT :limit"
+        ),
+        {"username": current_user.get("sub"), "start": start, "end": end, "limit": limit},
+    ).all()
+    return {"calls": [dict(row._mapping) for row in rows]}
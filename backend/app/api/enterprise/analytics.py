@@ -1,11 +1,21 @@
-from fastapi import APIRouter, Depends, Query
+import json
+from urllib.parse import parse_qs
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from pydantic import BaseModel
+from sqlalchemy import text
+from sqlalchemy.orm import Session
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta
-from ...auth.dependencies import get_current_user
+from ...auth.dependencies import get_current_user, verify_cdr_credentials
+from ...database import get_db
+from ...services.freeswitch import FreeSwitchService
+from ...services.call_quality import record_call_quality, summarize_quality
+from ..ranges import resolve_date_range
 
 router = APIRouter(tags=["analytics"])
 
+freeswitch_service = FreeSwitchService()
+
 class CallAnalytics(BaseModel):
     total_calls: int
     successful_calls: int
@@ -22,6 +32,10 @@ class UserAnalytics(BaseModel):
     total_cost: float
     most_called_numbers: List[str]
 
+class QualityIngestRequest(BaseModel):
+    # mod_json_cdr record; only the channel variables are used
+    variables: Dict[str, Any]
+
 class CostAnalytics(BaseModel):
     daily_cost: List[Dict[str, Any]]
     monthly_cost: float
@@ -32,20 +46,47 @@ def check_admin_permissions(current_user: dict = Depends(get_current_user)):
     # Check admin permissions
     return current_user
 
+# Handlers that query the database are plain functions so FastAPI runs them
+# in its threadpool instead of blocking the event loop on SQLAlchemy calls
+
 @router.get("/calls", response_model=CallAnalytics)
-async def get_call_analytics(
+def get_call_analytics(
     start_date: Optional[datetime] = Query(None),
     end_date: Optional[datetime] = Query(None),
-    current_user: dict = Depends(check_admin_permissions)
+    current_user: dict = Depends(check_admin_permissions),
+    db: Session = Depends(get_db)
 ):
-    # Placeholder analytics data
+    # Bounded on start_time so only the monthly partitions in range are read
+    start, end = resolve_date_range(start_date, end_date, 30)
+    params = {"start": start, "end": end}
+
+    totals = db.execute(
+        text(
+            "SELECT COUNT(*) AS total_calls, "
+            "COUNT(*) FILTER (WHERE status = 'completed') AS successful_calls, "
+            "COUNT(*) FILTER (WHERE status = 'failed') AS failed_calls, "
+            "COALESCE(AVG(duration), 0) AS average_duration "
+            "FROM calls WHERE start_time >= :start AND start_time < :end"
+        ),
+        params,
+    ).one()
+    peak_hours = db.execute(
+        text(
+            "SELECT EXTRACT(HOUR FROM start_time)::int AS hour FROM calls "
+            "WHERE start_time >= :start AND start_time < :end "
+            "GROUP BY hour ORDER BY COUNT(*) DESC, hour LIMIT 6"
+        ),
+        params,
+    ).scalars().all()
+
     return CallAnalytics(
-        total_calls=1250,
-        successful_calls=1180,
-        failed_calls=70,
-        average_duration=125.5,
-        total_cost=2450.75,
-        peak_hours=[9, 10, 11, 14, 15, 16]
+        total_calls=totals.total_calls,
+        successful_calls=totals.successful_calls,
+        failed_calls=totals.failed_calls,
+        average_duration=round(float(totals.average_duration), 2),
+        # calls has no cost column yet
+        total_cost=0.0,
+        peak_hours=sorted(peak_hours)
     )
 
 @router.get("/users", response_model=List[UserAnalytics])
@@ -99,18 +140,54 @@ async def get_cost_analytics(
     )
 
 @router.get("/quality")
-async def get_quality_analytics(current_user: dict = Depends(check_admin_permissions)):
-    return {
-        "average_quality_score": 4.2,
-        "quality_distribution": {
-            "excellent": 45,
-            "good": 35,
-            "fair": 15,
-            "poor": 5
-        },
-        "quality_trends": [
-            {"date": "2024-01-01", "score": 4.1},
-            {"date": "2024-01-02", "score": 4.3},
-            {"date": "2024-01-03", "score": 4.2}
-        ]
-    }
\ No newline at end of file
+def get_quality_analytics(
+    start_date: Optional[datetime] = Query(None),
+    end_date: Optional[datetime] = Query(None),
+    codec: Optional[str] = Query(None),
+    destination: Optional[str] = Query(None),
+    current_user: dict = Depends(check_admin_permissions),
+    db: Session = Depends(get_db)
+):
+    start, end = resolve_date_range(start_date, end_date, 7)
+    return summarize_quality(db, start, end, codec=codec, destination=destination)
+
+def _ingest_variables(variables: Dict[str, Any], db: Session):
+    stats = freeswitch_service.extract_quality_stats(variables)
+    if stats is None:
+        return {"ingested": False, "reason": "no usable media quality stats"}
+    if not stats["call_id"]:
+        return {"ingested": False, "reason": "missing call uuid"}
+    result = record_call_quality(db, stats)
+    if result is None:
+        return {"ingested": False, "reason": "already ingested"}
+    return {"ingested": True, **result}
+
+async def read_cdr_record(request: Request) -> Dict[str, Any]:
+    # mod_json_cdr posts raw JSON with encode=false, or a urlencoded
+    # "cdr" form field otherwise
+    body = (await request.body()).decode()
+    if not request.headers.get("content-type", "").startswith("application/json"):
+        body = parse_qs(body).get("cdr", [""])[0]
+    try:
+        record = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid CDR payload")
+    if not isinstance(record, dict) or not isinstance(record.get("variables"), dict):
+        raise HTTPException(status_code=400, detail="CDR record has no variables")
+    return record
+
+@router.post("/quality/ingest")
+def ingest_call_quality(
+    record: QualityIngestRequest,
+    current_user: dict = Depends(check_admin_permissions),
+    db: Session = Depends(get_db)
+):
+    return _ingest_variables(record.variables, db)
+
+@router.post("/quality/cdr")
+def ingest_call_quality_cdr(
+    record: Dict[str, Any] = Depends(read_cdr_record),
+    cdr_user: str = Depends(verify_cdr_credentials),
+    db: Session = Depends(get_db)
+):
+    return _ingest_variables(record["variables"], db)
@@ -0,0 +1,25 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
+from fastapi import HTTPException
+
+def _as_utc(moment: datetime) -> datetime:
+    # Stored timestamps are naive UTC, so normalise offset-aware query values
+    if moment.tzinfo is None:
+        return moment
+    return moment.astimezone(timezone.utc).replace(tzinfo=None)
+
+def resolve_date_range(
+    start_date: Optional[datetime],
+    end_date: Optional[datetime],
+    default_days: int
+) -> Tuple[datetime, datetime]:
+    """Fill in missing query bounds and reject empty ranges
+
+    ``end_date`` defaults to now and ``start_date`` to ``default_days``
+    before it; both are returned as naive UTC.
+    """
+    end = _as_utc(end_date) if end_date else datetime.utcnow()
+    start = _as_utc(start_date) if start_date else end - timedelta(days=default_days)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="start_date must be before end_date")
+    return start, end
@@ -1,8 +1,11 @@
+import secrets
 from fastapi import Depends, HTTPException, status
-from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials, HTTPBasic, HTTPBasicCredentials
 from .jwt_handler import verify_token
+from ..config import settings
 
 security = HTTPBearer()
+cdr_security = HTTPBasic()
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     credentials_exception = HTTPException(
@@ -15,4 +18,19 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
     if payload is None:
         raise credentials_exception
     
-    return payload
\ No newline at end of file
+    return payload
+
+async def verify_cdr_credentials(credentials: HTTPBasicCredentials = Depends(cdr_security)):
+    # mod_json_cdr can only authenticate with basic auth, not bearer tokens
+    valid = bool(settings.cdr_password) and secrets.compare_digest(
+        credentials.username.encode(), settings.cdr_username.encode()
+    ) and secrets.compare_digest(
+        credentials.password.encode(), settings.cdr_password.encode()
+    )
+    if not valid:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid CDR credentials",
+            headers={"WWW-Authenticate": "Basic"},
+        )
+    return credentials.username
@@ -6,6 +6,16 @@ class Settings(BaseSettings):
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-here")
     algorithm: str = "HS256"
     access_token_expire_minutes: int = 30
+    # Basic auth credentials FreeSWITCH mod_json_cdr posts hangup records with
+    cdr_username: str = os.getenv("CDR_USERNAME", "freeswitch")
+    cdr_password: str = os.getenv("CDR_PASSWORD", "")
+    # Months of calls/call_logs to keep; 0 disables partition pruning
+    call_retention_months: int = int(os.getenv("CALL_RETENTION_MONTHS", "12"))
+    partition_premake_months: int = int(os.getenv("PARTITION_PREMAKE_MONTHS", "3"))
+    # Maintenance fails loudly when fewer months than this are partitioned ahead
+    partition_min_months_ahead: int = int(os.getenv("PARTITION_MIN_MONTHS_AHEAD", "2"))
+    # How often the API runs partition maintenance; 0 leaves it to cron
+    partition_maintenance_interval_hours: int = int(os.getenv("PARTITION_MAINTENANCE_INTERVAL_HOURS", "24"))
     
     class Config:
         env_file = ".env"
@@ -1,6 +1,9 @@
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer
+from contextlib import asynccontextmanager
+import asyncio
 import os
 from dotenv import load_dotenv
 
@@ -13,13 +16,29 @@ from app.api.core import privacy as core_privacy
 from app.api.enterprise import admin as enterprise_admin
 from app.api.enterprise import analytics as enterprise_analytics
 
+from app.config import settings
+from app.services import partitions
+
 # Load environment variables
 load_dotenv()
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Keep calls/call_logs partitions created ahead and expired months dropped
+    maintenance = None
+    if settings.partition_maintenance_interval_hours > 0:
+        maintenance = asyncio.create_task(
+            partitions.maintain_partitions_periodically(settings.partition_maintenance_interval_hours)
+        )
+    yield
+    if maintenance:
+        maintenance.cancel()
+
 app = FastAPI(
     title="SIP Call API", 
     version="1.0.0",
-    description="Modular SIP calling API with core and enterprise features"
+    description="Modular SIP calling API with core and enterprise features",
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -55,6 +74,9 @@ async def root():
 
 @app.get("/api/v1/health")
 async def health_check():
+    # Call inserts start failing once partition maintenance falls behind
+    if partitions.last_run.get("errors"):
+        return JSONResponse(status_code=503, content={"status": "degraded", "partitions": partitions.last_run})
     return {"status": "healthy"}
 
 @app.get("/api/v1/features")
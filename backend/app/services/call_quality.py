@@ -0,0 +1,409 @@
+import json
+import logging
+import math
+from datetime import datetime, timedelta
+from typing import Dict, Any, List, Optional, Iterable
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# MOS is reported on a 1.0 - 5.0 scale; anything outside is clamped
+MOS_MIN = 1.0
+MOS_MAX = 5.0
+
+# Lower bounds of the MOS distribution buckets, best first
+MOS_BUCKETS = [
+    ("excellent", 4.3),
+    ("good", 4.0),
+    ("fair", 3.6),
+    ("poor", MOS_MIN),
+]
+
+# Per-call stats sketched in every hourly row: stats field -> column
+SKETCHED_STATS = {
+    "mos": "mos_sketch",
+    "jitter_max_variance": "jitter_sketch",
+    "packet_loss_rate": "loss_sketch",
+}
+
+UNKNOWN = "unknown"
+INTERNAL = "internal"
+MAX_EXTENSION_DIGITS = 6
+
+# E.164 country codes are prefix-free; every code not listed here is three
+# digits long (ITU-T E.164 assignments)
+ONE_DIGIT_COUNTRY_CODES = {"1", "7"}
+TWO_DIGIT_COUNTRY_CODES = {
+    "20", "27", "30", "31", "32", "33", "34", "36", "39", "40", "41", "43",
+    "44", "45", "46", "47", "48", "49", "51", "52", "53", "54", "55", "56",
+    "57", "58", "60", "61", "62", "63", "64", "65", "66", "81", "82", "84",
+    "86", "90", "91", "92", "93", "94", "95", "98",
+}
+
+# Window used to locate a call's row from its FreeSWITCH timestamps
+MAX_CALL_DURATION = timedelta(days=1)
+CLOCK_SKEW = timedelta(hours=1)
+
+
+class QualitySketch:
+    """Mergeable quantile sketch with relative-error guarantees (DDSketch)
+
+    Values are counted in logarithmically sized bins, so two sketches are
+    merged by adding their bin counts and any quantile can be answered with
+    at most ``relative_accuracy`` error regardless of how many sketches
+    were combined. Zeros (e.g. no packet loss) are counted separately.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def add(self, value: float, weight: int = 1):
+        """Record a non-negative, finite value"""
+        if not math.isfinite(value) or value < 0:
+            raise ValueError("QualitySketch only accepts non-negative finite values")
+        if value == 0:
+            self.zero_count += weight
+        else:
+            index = math.ceil(math.log(value) / self._log_gamma)
+            self.bins[index] = self.bins.get(index, 0) + weight
+        self.count += weight
+        self.total += value * weight
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def merge(self, other: "QualitySketch"):
+        """Fold another sketch with the same accuracy into this one"""
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for index, weight in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + weight
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+        if other.min is not None:
+            self.min = other.min if self.min is None else min(self.min, other.min)
+        if other.max is not None:
+            self.max = other.max if self.max is None else max(self.max, other.max)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimate the q-quantile (0 <= q <= 1), or None when empty"""
+        if self.count == 0:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        rank = q * (self.count - 1)
+        if rank < self.zero_count:
+            return 0.0
+        seen = self.zero_count
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "bins": {str(index): weight for index, weight in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.total,
+            "min": self.min,
+            "max": self.max,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "QualitySketch":
+        sketch = cls(data.get("relative_accuracy", 0.01))
+        sketch.bins = {int(index): weight for index, weight in data.get("bins", {}).items()}
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.count = data.get("count", 0)
+        sketch.total = data.get("sum", 0.0)
+        sketch.min = data.get("min")
+        sketch.max = data.get("max")
+        return sketch
+
+
+def mos_bucket(score: float) -> str:
+    """Map a MOS value to its distribution bucket name"""
+    for name, lower_bound in MOS_BUCKETS:
+        if score >= lower_bound:
+            return name
+    return MOS_BUCKETS[-1][0]
+
+
+def empty_histogram() -> Dict[str, int]:
+    return {name: 0 for name, _ in MOS_BUCKETS}
+
+
+def merge_histograms(target: Dict[str, int], other: Dict[str, int]) -> Dict[str, int]:
+    for name, count in other.items():
+        target[name] = target.get(name, 0) + count
+    return target
+
+
+def destination_prefix(number: Optional[str]) -> str:
+    """Group a dialled number by its country code, e.g. +4420... -> +44
+
+    Only E.164 numbers are grouped; short numbers are internal extensions
+    and anything else (national or 00-prefixed formats) is unknown.
+    """
+    if not number:
+        return UNKNOWN
+    digits = "".join(ch for ch in number if ch.isdigit())
+    if not number.strip().startswith("+"):
+        return INTERNAL if 0 < len(digits) <= MAX_EXTENSION_DIGITS else UNKNOWN
+    if not digits or digits[0] == "0":
+        return UNKNOWN
+    if digits[0] in ONE_DIGIT_COUNTRY_CODES:
+        return f"+{digits[0]}"
+    if digits[:2] in TWO_DIGIT_COUNTRY_CODES:
+        return f"+{digits[:2]}"
+    return f"+{digits[:3]}"
+
+
+def hour_bucket(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def hour_ceiling(moment: datetime) -> datetime:
+    floor = hour_bucket(moment)
+    return floor if floor == moment else floor + timedelta(hours=1)
+
+
+def _load_json(value):
+    # psycopg2 decodes JSONB already; other drivers may hand back text
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def record_call_quality(db: Session, stats: Dict[str, Any]):
+    """Fold a single call's quality stats into its hourly sketch row
+
+    ``stats`` is the output of ``FreeSwitchService.extract_quality_stats``
+    and must carry the call UUID. Each call is folded in at most once:
+    redelivered records (mod_json_cdr retries, or the same call posted to
+    both ingest endpoints) return None without touching the sketches. The
+    hourly row is locked while it is updated, so concurrent hangups for
+    the same hour, codec and destination never lose samples.
+    """
+    score = min(max(stats["mos"], MOS_MIN), MOS_MAX)
+    values = {**{field: stats.get(field) for field in SKETCHED_STATS}, "mos": score}
+    key = {
+        "bucket_start": hour_bucket(stats["ended_at"]),
+        "codec": stats.get("codec") or UNKNOWN,
+        "destination": destination_prefix(stats.get("destination_number")),
+    }
+    columns = list(SKETCHED_STATS.values())
+
+    try:
+        # Claimed in the same transaction as the sketch update, so a retry
+        # either sees the claim or finds nothing was recorded
+        claimed = db.execute(
+            text(
+                "INSERT INTO call_quality_ingested (call_id, ended_at) "
+                "VALUES (:call_id, :ended_at) ON CONFLICT (call_id) DO NOTHING"
+            ),
+            {"call_id": stats["call_id"], "ended_at": stats["ended_at"]},
+        ).rowcount
+        if not claimed:
+            db.rollback()
+            return None
+
+        empty_sketch = json.dumps(QualitySketch().to_dict())
+        db.execute(
+            text(
+                "INSERT INTO call_quality_hourly "
+                f"(bucket_start, codec, destination, mos_histogram, {', '.join(columns)}) "
+                "VALUES (:bucket_start, :codec, :destination, :histogram, "
+                f"{', '.join(':' + column for column in columns)}) "
+                "ON CONFLICT (bucket_start, codec, destination) DO NOTHING"
+            ),
+            {
+                **key,
+                "histogram": json.dumps(empty_histogram()),
+                **{column: empty_sketch for column in columns},
+            },
+        )
+        row = db.execute(
+            text(
+                f"SELECT mos_histogram, {', '.join(columns)} FROM call_quality_hourly "
+                "WHERE bucket_start = :bucket_start AND codec = :codec "
+                "AND destination = :destination FOR UPDATE"
+            ),
+            key,
+        ).one()
+
+        sketches = {}
+        for field, column in SKETCHED_STATS.items():
+            sketch = QualitySketch.from_dict(_load_json(getattr(row, column)))
+            if values[field] is not None and values[field] >= 0:
+                sketch.add(values[field])
+            sketches[column] = json.dumps(sketch.to_dict())
+        histogram = _load_json(row.mos_histogram)
+        bucket = mos_bucket(score)
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+
+        db.execute(
+            text(
+                "UPDATE call_quality_hourly SET mos_histogram = :histogram, "
+                f"{', '.join(f'{column} = :{column}' for column in columns)}, "
+                "updated_at = CURRENT_TIMESTAMP "
+                "WHERE bucket_start = :bucket_start AND codec = :codec "
+                "AND destination = :destination"
+            ),
+            {**key, "histogram": json.dumps(histogram), **sketches},
+        )
+
+        call_updated = _update_call_quality(db, stats, score, key["codec"])
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+
+    return {**key, "mos": score, "bucket": bucket, "call_updated": call_updated}
+
+
+def _update_call_quality(db: Session, stats: Dict[str, Any], score: float, codec: str) -> bool:
+    # calls.start_time is naive UTC like the FreeSWITCH epochs; bounding it
+    # lets Postgres prune calls to one or two monthly partitions instead of
+    # probing every call_id index
+    started_at = stats.get("started_at") or stats["ended_at"] - MAX_CALL_DURATION
+    matches = db.execute(
+        text(
+            "SELECT id, start_time FROM calls WHERE call_id = :call_id "
+            "AND start_time >= :window_start AND start_time <= :window_end "
+            "ORDER BY start_time DESC LIMIT 2"
+        ),
+        {
+            "call_id": stats["call_id"],
+            "window_start": started_at - CLOCK_SKEW,
+            "window_end": stats["ended_at"] + CLOCK_SKEW,
+        },
+    ).all()
+    if not matches:
+        logger.warning(f"No call row found for quality stats of call {stats['call_id']}")
+        return False
+    if len(matches) > 1:
+        # call_id is only unique together with start_time since partitioning
+        logger.warning(f"Several call rows match call {stats['call_id']}; updating the latest")
+
+    db.execute(
+        text(
+            "UPDATE calls SET quality_score = :score, codec = :codec "
+            "WHERE id = :id AND start_time = :start_time"
+        ),
+        {"score": round(score, 2), "codec": codec, "id": matches[0].id, "start_time": matches[0].start_time},
+    )
+    return True
+
+
+def _rounded(value: Optional[float], digits: int = 2) -> Optional[float]:
+    return round(value, digits) if value is not None else None
+
+
+def _summarize(sketches: Dict[str, QualitySketch], histogram: Dict[str, int]) -> Dict[str, Any]:
+    mos = sketches["mos"]
+    return {
+        "total_calls": mos.count,
+        "average_quality_score": _rounded(mos.mean),
+        "p50_quality_score": _rounded(mos.quantile(0.5)),
+        "p95_quality_score": _rounded(mos.quantile(0.95)),
+        "quality_distribution": histogram,
+        "jitter_max_variance": {
+            "p50": _rounded(sketches["jitter_max_variance"].quantile(0.5)),
+            "p95": _rounded(sketches["jitter_max_variance"].quantile(0.95)),
+        },
+        "packet_loss_rate": {
+            "p50": _rounded(sketches["packet_loss_rate"].quantile(0.5), 4),
+            "p95": _rounded(sketches["packet_loss_rate"].quantile(0.95), 4),
+        },
+    }
+
+
+def _merge_rows(rows: Iterable) -> Dict[str, Any]:
+    sketches = {field: QualitySketch() for field in SKETCHED_STATS}
+    histogram = empty_histogram()
+    for row in rows:
+        for field, column in SKETCHED_STATS.items():
+            sketches[field].merge(QualitySketch.from_dict(_load_json(getattr(row, column))))
+        merge_histograms(histogram, _load_json(row.mos_histogram))
+    return _summarize(sketches, histogram)
+
+
+def _group(rows: List, key) -> Dict[Any, List]:
+    groups: Dict[Any, List] = {}
+    for row in rows:
+        groups.setdefault(key(row), []).append(row)
+    return groups
+
+
+def summarize_quality(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    codec: Optional[str] = None,
+    destination: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Merge the hourly sketches covering [start, end) into a quality summary
+
+    Only ``call_quality_hourly`` is read. Sketches are per hour, so the
+    range is widened to whole hours: start is rounded down and end up, and
+    the widened bounds are returned as ``start_date``/``end_date``.
+    """
+    start, end = hour_bucket(start), hour_ceiling(end)
+    filters = ["bucket_start >= :start", "bucket_start < :end"]
+    params: Dict[str, Any] = {"start": start, "end": end}
+    if codec:
+        filters.append("codec = :codec")
+        params["codec"] = codec
+    if destination:
+        filters.append("destination = :destination")
+        params["destination"] = destination
+
+    rows = db.execute(
+        text(
+            "SELECT bucket_start, codec, destination, mos_histogram, "
+            + ", ".join(SKETCHED_STATS.values())
+            + " FROM call_quality_hourly WHERE " + " AND ".join(filters)
+        ),
+        params,
+    ).all()
+
+    summary = {"start_date": start, "end_date": end, **_merge_rows(rows)}
+    summary["by_codec"] = [
+        {"codec": name, **_merge_rows(group)}
+        for name, group in sorted(_group(rows, lambda row: row.codec).items())
+    ]
+    summary["by_destination"] = [
+        {"destination": name, **_merge_rows(group)}
+        for name, group in sorted(_group(rows, lambda row: row.destination).items())
+    ]
+    summary["quality_trends"] = []
+    for day, group in sorted(_group(rows, lambda row: row.bucket_start.date()).items()):
+        day_summary = _merge_rows(group)
+        summary["quality_trends"].append({
+            "date": day.isoformat(),
+            "score": day_summary["average_quality_score"],
+            "p50": day_summary["p50_quality_score"],
+            "p95": day_summary["p95_quality_score"],
+            "calls": day_summary["total_calls"],
+        })
+    return summary
+
@@ -1,7 +1,10 @@
 import asyncio
 import websockets
 import json
-from typing import Dict, Any
+import math
+from datetime import datetime
+from typing import Dict, Any, Optional
+from urllib.parse import unquote
 
 class FreeSwitchService:
     def __init__(self, host: str = "localhost", port: int = 8021, password: str = "ClueCon"):
@@ -35,4 +38,61 @@ class FreeSwitchService:
         return {
             "call_id": call_id,
             "status": "terminated"
-        }
\ No newline at end of file
+        }
+
+    def extract_quality_stats(self, variables: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Extract per-call RTP/MOS stats from hangup channel variables
+
+        Accepts the ``variables`` section of a mod_json_cdr record or the
+        headers of a CHANNEL_HANGUP_COMPLETE event, whose channel variables
+        carry a ``variable_`` prefix. Returns None when the call carried
+        no media, i.e. FreeSWITCH did not compute a MOS for it, or when the
+        MOS or hangup time is not a usable value.
+        """
+        prefix = "variable_"
+        variables = {
+            name[len(prefix):] if name.startswith(prefix) else name: raw
+            for name, raw in variables.items()
+        }
+
+        def value(name: str) -> Optional[str]:
+            raw = variables.get(name)
+            return unquote(str(raw)) if raw not in (None, "") else None
+
+        def number(name: str) -> Optional[float]:
+            try:
+                parsed = float(value(name))
+            except (TypeError, ValueError):
+                return None
+            return parsed if math.isfinite(parsed) else None
+
+        def timestamp(name: str) -> Optional[datetime]:
+            epoch = number(name)
+            if not epoch:
+                return None
+            try:
+                return datetime.utcfromtimestamp(epoch)
+            except (OverflowError, OSError, ValueError):
+                return None
+
+        mos = number("rtp_audio_in_mos")
+        if not mos or mos <= 0:
+            return None
+
+        packets = number("rtp_audio_in_packet_count")
+        skipped = number("rtp_audio_in_skip_packet_count")
+        # A missing hangup time falls back to now; a garbled one is rejected
+        ended_at = timestamp("end_epoch") if value("end_epoch") not in (None, "0") else datetime.utcnow()
+        if ended_at is None:
+            return None
+
+        return {
+            "call_id": value("call_uuid") or value("uuid"),
+            "destination_number": value("destination_number"),
+            "codec": value("rtp_use_codec_name") or value("read_codec"),
+            "mos": mos,
+            "jitter_max_variance": number("rtp_audio_in_jitter_max_variance"),
+            "packet_loss_rate": skipped / packets if packets and skipped is not None else None,
+            "started_at": timestamp("start_epoch"),
+            "ended_at": ended_at,
+        }
@@ -0,0 +1,225 @@
+import asyncio
+import logging
+import re
+import sys
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from .. import database
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tables range-partitioned by month, see the partition_calls_by_month migration
+PARTITIONED_TABLES = ["calls", "call_logs"]
+
+PARTITION_NAME = re.compile(r"^(?P<table>\w+)_y(?P<year>\d{4})m(?P<month>\d{2})$")
+
+# Advisory lock key so API workers and cron runs never maintain concurrently
+MAINTENANCE_LOCK_KEY = 2025101901
+
+# Outcome of the last maintenance run in this process, see /api/v1/health
+last_run: Dict[str, Any] = {}
+
+
+def month_start(moment: date) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    """Name of the partition holding ``month``, matching create_monthly_partition"""
+    return f"{table}_y{month.year:04d}m{month.month:02d}"
+
+
+def partition_month(table: str, name: str) -> Optional[date]:
+    """First day of the month a partition of ``table`` holds, or None"""
+    match = PARTITION_NAME.match(name)
+    if not match or match.group("table") != table:
+        return None
+    year, month = int(match.group("year")), int(match.group("month"))
+    return date(year, month, 1) if 1 <= month <= 12 else None
+
+
+def retention_cutoff(today: date, retention_months: int) -> date:
+    """Partitions ending on or before this date are expired
+
+    Keeps the current month plus ``retention_months`` full months before it.
+    """
+    return add_months(month_start(today), -retention_months)
+
+
+def expired_partitions(table: str, names: Iterable[str], cutoff: date) -> List[str]:
+    expired = []
+    for name in sorted(names):
+        month = partition_month(table, name)
+        if month is not None and add_months(month, 1) <= cutoff:
+            expired.append(name)
+    return expired
+
+
+def horizon_error(table: str, names: Iterable[str], today: date, months_ahead: int) -> Optional[str]:
+    """Describe the problem when ``table`` has no partition ``months_ahead`` months out
+
+    Inserts past the newest partition fail, so running short is reported
+    while there is still time to fix it.
+    """
+    months = [month for month in (partition_month(table, name) for name in names) if month]
+    newest = max(months, default=None)
+    required = add_months(month_start(today), months_ahead)
+    if newest is not None and newest >= required:
+        return None
+    found = partition_name(table, newest) if newest else "none"
+    return f"newest {table} partition is {found}, expected at least {partition_name(table, required)}"
+
+
+def detached_marker(table: str) -> str:
+    """Comment set on a partition just before this job detaches it
+
+    A table left detached by an interrupted run is only dropped later if it
+    still carries this comment, so unrelated tables are never touched.
+    """
+    return f"partition of {table} detached by app.services.partitions"
+
+
+def _drop_partition(conn: Connection, table: str, name: str, partition: Dict[str, str]):
+    quote = conn.dialect.identifier_preparer.quote
+    parent = f"{quote(partition['parent_schema'])}.{quote(table)}"
+    qualified = f"{quote(partition['schema'])}.{quote(name)}"
+    if partition["state"] == "attached":
+        marker = detached_marker(table).replace("'", "''")
+        conn.execute(text(f"COMMENT ON TABLE {qualified} IS '{marker}'"))
+        # CONCURRENTLY only takes SHARE UPDATE EXCLUSIVE on the parent, so
+        # call inserts keep flowing; it cannot run inside a transaction
+        conn.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {qualified} CONCURRENTLY"))
+    elif partition["state"] == "detach_pending":
+        # A previous concurrent detach was interrupted
+        conn.execute(text(f"ALTER TABLE {parent} DETACH PARTITION {qualified} FINALIZE"))
+    conn.execute(text(f"DROP TABLE {qualified}"))
+
+
+def _partition_states(conn: Connection, table: str) -> Dict[str, Dict[str, str]]:
+    # Partitions of the parent table resolved through search_path, plus
+    # tables in its schema that an interrupted run detached but did not drop
+    rows = conn.execute(
+        text(
+            "WITH parent AS ("
+            "  SELECT c.oid, c.relnamespace, n.nspname FROM pg_class c "
+            "  JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "  WHERE c.oid = CAST(:table AS regclass)"
+            ") "
+            "SELECT n.nspname AS schema, c.relname, parent.nspname AS parent_schema, "
+            "CASE WHEN i.inhdetachpending THEN 'detach_pending' ELSE 'attached' END AS state "
+            "FROM parent JOIN pg_inherits i ON i.inhparent = parent.oid "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_namespace n ON n.oid = c.relnamespace "
+            "UNION ALL "
+            "SELECT parent.nspname, c.relname, parent.nspname, 'detached' "
+            "FROM parent JOIN pg_class c ON c.relnamespace = parent.relnamespace "
+            "WHERE c.relkind = 'r' AND NOT c.relispartition "
+            "AND obj_description(c.oid, 'pg_class') = :marker"
+        ),
+        {"table": table, "marker": detached_marker(table)},
+    ).all()
+    return {
+        row.relname: {"schema": row.schema, "parent_schema": row.parent_schema, "state": row.state}
+        for row in rows
+    }
+
+
+def maintain_partitions(
+    engine: Optional[Engine] = None,
+    today: Optional[date] = None,
+    premake_months: Optional[int] = None,
+    retention_months: Optional[int] = None,
+    min_months_ahead: Optional[int] = None,
+) -> Dict[str, Dict[str, List[str]]]:
+    """Pre-create upcoming monthly partitions and drop expired ones
+
+    Runs in autocommit mode, so each partition is created or dropped in its
+    own short transaction and a failure on one table does not undo the
+    work already done or stop the other tables from being maintained.
+    When another process holds the maintenance lock only the horizon check
+    runs. Requires PostgreSQL 14+ for DETACH PARTITION CONCURRENTLY.
+    """
+    engine = engine or database.engine
+    today = today or datetime.utcnow().date()
+    premake_months = settings.partition_premake_months if premake_months is None else premake_months
+    retention_months = settings.call_retention_months if retention_months is None else retention_months
+    min_months_ahead = settings.partition_min_months_ahead if min_months_ahead is None else min_months_ahead
+    current = month_start(today)
+
+    result = {}
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        locked = conn.execute(
+            text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}
+        ).scalar()
+        if not locked:
+            logger.info("Partition maintenance is running elsewhere; only checking the horizon")
+        try:
+            for table in PARTITIONED_TABLES:
+                changes = {"ensured": [], "dropped": [], "errors": []}
+                result[table] = changes
+                try:
+                    if locked:
+                        for offset in range(premake_months + 1):
+                            changes["ensured"].append(conn.execute(
+                                text("SELECT create_monthly_partition(:table, :month)"),
+                                {"table": table, "month": add_months(current, offset)},
+                            ).scalar())
+                    states = _partition_states(conn, table)
+                    if locked and retention_months > 0:
+                        cutoff = retention_cutoff(today, retention_months)
+                        for name in expired_partitions(table, states, cutoff):
+                            _drop_partition(conn, table, name, states[name])
+                            changes["dropped"].append(name)
+                    attached = [name for name, partition in states.items() if partition["state"] == "attached"]
+                    shortfall = horizon_error(table, attached, today, min_months_ahead)
+                    if shortfall:
+                        changes["errors"].append(shortfall)
+                except Exception as e:
+                    logger.exception(f"Partition maintenance failed for {table}")
+                    changes["errors"].append(str(e))
+        finally:
+            if locked:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+    return result
+
+
+def run_maintenance() -> List[str]:
+    """Run maintain_partitions, record the outcome in ``last_run`` and return its errors"""
+    try:
+        result = maintain_partitions()
+        errors = [f"{table}: {error}" for table, changes in result.items() for error in changes["errors"]]
+        for table, changes in result.items():
+            logger.info(f"{table}: ensured {', '.join(changes['ensured']) or 'none'}; "
+                        f"dropped {', '.join(changes['dropped']) or 'none'}")
+    except Exception as e:
+        logger.exception("Partition maintenance could not run")
+        errors = [str(e)]
+    if errors:
+        # Call inserts fail once the newest partition is used up
+        logger.critical(f"Partition maintenance needs attention: {'; '.join(errors)}")
+    last_run.update(checked_at=datetime.utcnow().isoformat(), errors=errors)
+    return errors
+
+
+async def maintain_partitions_periodically(interval_hours: int):
+    """Run partition maintenance now and every ``interval_hours`` until cancelled"""
+    while True:
+        await asyncio.to_thread(run_maintenance)
+        await asyncio.sleep(interval_hours * 3600)
+
+
+if __name__ == "__main__":
+    # For cron or an external scheduler: python -m app.services.partitions
+    # exits non-zero when maintenance failed or partitions run short
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(1 if run_maintenance() else 0)
@@ -0,0 +1,182 @@
+import random
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.call_quality import (
+    SKETCHED_STATS,
+    QualitySketch,
+    _merge_rows,
+    destination_prefix,
+    empty_histogram,
+    mos_bucket,
+    record_call_quality,
+)
+from app.services.freeswitch import FreeSwitchService
+
+def test_quantiles_after_merge():
+    rng = random.Random(42)
+    values = [rng.uniform(1.0, 4.5) for _ in range(10000)]
+    first, second = QualitySketch(), QualitySketch()
+    for i, value in enumerate(values):
+        (first if i % 2 else second).add(value)
+    first.merge(second)
+
+    ordered = sorted(values)
+    assert first.count == len(values)
+    for q in (0.5, 0.95):
+        exact = ordered[int(q * (len(ordered) - 1))]
+        assert abs(first.quantile(q) - exact) <= 0.02 * exact
+    assert first.quantile(0) == ordered[0]
+    assert first.quantile(1) == ordered[-1]
+
+def test_merge_rejects_different_accuracy():
+    with pytest.raises(ValueError):
+        QualitySketch(0.01).merge(QualitySketch(0.02))
+
+@pytest.mark.parametrize("value", [-1.0, float("nan"), float("inf")])
+def test_sketch_rejects_unusable_values(value):
+    with pytest.raises(ValueError):
+        QualitySketch().add(value)
+
+def test_sketch_counts_zeros():
+    sketch = QualitySketch()
+    for value in (0.0, 0.0, 0.0, 0.02, 0.05):
+        sketch.add(value)
+    restored = QualitySketch.from_dict(sketch.to_dict())
+
+    assert restored.zero_count == 3
+    assert restored.quantile(0.5) == 0.0
+    assert restored.quantile(0.75) == pytest.approx(0.02, rel=0.02)
+    assert restored.quantile(1) == 0.05
+
+def test_merge_rows_summarizes_every_sketched_stat():
+    def row(mos, jitter, loss):
+        sketches = {field: QualitySketch() for field in SKETCHED_STATS}
+        for field, value in (("mos", mos), ("jitter_max_variance", jitter), ("packet_loss_rate", loss)):
+            sketches[field].add(value)
+        histogram = empty_histogram()
+        histogram[mos_bucket(mos)] += 1
+        return SimpleNamespace(
+            mos_histogram=histogram,
+            **{column: sketches[field].to_dict() for field, column in SKETCHED_STATS.items()},
+        )
+
+    summary = _merge_rows([row(4.4, 12.0, 0.0), row(3.5, 30.0, 0.1)])
+
+    assert summary["total_calls"] == 2
+    assert summary["average_quality_score"] == pytest.approx(3.95)
+    assert summary["quality_distribution"] == {"excellent": 1, "good": 0, "fair": 0, "poor": 1}
+    assert summary["jitter_max_variance"]["p50"] == pytest.approx(12.0, rel=0.02)
+    assert summary["packet_loss_rate"]["p50"] == 0.0
+
+def test_empty_sketch():
+    sketch = QualitySketch()
+    assert sketch.quantile(0.5) is None
+    assert sketch.mean is None
+
+def test_sketch_round_trip():
+    sketch = QualitySketch()
+    for value in (1.2, 3.7, 4.1, 4.1, 4.4):
+        sketch.add(value)
+    restored = QualitySketch.from_dict(sketch.to_dict())
+
+    assert restored.bins == sketch.bins
+    assert restored.count == sketch.count
+    assert restored.mean == pytest.approx(sketch.mean)
+    assert (restored.min, restored.max) == (1.2, 4.4)
+    for q in (0.25, 0.5, 0.95):
+        assert restored.quantile(q) == sketch.quantile(q)
+
+@pytest.mark.parametrize("score, bucket", [
+    (5.0, "excellent"),
+    (4.3, "excellent"),
+    (4.29, "good"),
+    (4.0, "good"),
+    (3.99, "fair"),
+    (3.6, "fair"),
+    (3.59, "poor"),
+    (1.0, "poor"),
+])
+def test_mos_bucket_boundaries(score, bucket):
+    assert mos_bucket(score) == bucket
+
+@pytest.mark.parametrize("number, prefix", [
+    ("+15551234567", "+1"),
+    ("+44 20 7946 0000", "+44"),
+    ("+353 1 234 5678", "+353"),
+    ("1001", "internal"),
+    ("0044201234567", "unknown"),
+    (None, "unknown"),
+])
+def test_destination_prefix(number, prefix):
+    assert destination_prefix(number) == prefix
+
+class ClaimedSession:
+    """Session stub whose call_quality_ingested claim always conflicts"""
+
+    def __init__(self):
+        self.statements = []
+        self.rolled_back = False
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return SimpleNamespace(rowcount=0)
+
+    def rollback(self):
+        self.rolled_back = True
+
+def test_record_call_quality_skips_redelivered_call():
+    db = ClaimedSession()
+    stats = {"call_id": "abc-123", "mos": 4.2, "ended_at": datetime(2025, 1, 27, 12)}
+
+    assert record_call_quality(db, stats) is None
+    assert len(db.statements) == 1
+    assert "call_quality_ingested" in db.statements[0]
+    assert db.rolled_back
+
+def test_extract_quality_stats_from_cdr_variables():
+    stats = FreeSwitchService().extract_quality_stats({
+        "call_uuid": "abc-123",
+        "destination_number": "%2B442079460000",
+        "rtp_use_codec_name": "OPUS",
+        "rtp_audio_in_mos": "4.32",
+        "rtp_audio_in_packet_count": "1000",
+        "rtp_audio_in_skip_packet_count": "20",
+        "start_epoch": "1737979000",
+        "end_epoch": "1737979200",
+    })
+
+    assert stats["call_id"] == "abc-123"
+    assert stats["destination_number"] == "+442079460000"
+    assert stats["codec"] == "OPUS"
+    assert stats["mos"] == 4.32
+    assert stats["packet_loss_rate"] == pytest.approx(0.02)
+    assert stats["started_at"] == datetime(2025, 1, 27, 11, 56, 40)
+    assert stats["ended_at"] == datetime(2025, 1, 27, 12, 0, 0)
+
+def test_extract_quality_stats_from_esl_headers():
+    stats = FreeSwitchService().extract_quality_stats({
+        "Event-Name": "CHANNEL_HANGUP_COMPLETE",
+        "variable_uuid": "abc-123",
+        "variable_rtp_audio_in_mos": "3.9",
+        "variable_read_codec": "PCMU",
+    })
+
+    assert stats["call_id"] == "abc-123"
+    assert stats["mos"] == 3.9
+    assert stats["codec"] == "PCMU"
+
+@pytest.mark.parametrize("variables", [
+    {"rtp_use_codec_name": "PCMU"},
+    {"rtp_audio_in_mos": ""},
+    {"rtp_audio_in_mos": "0.00"},
+    {"rtp_audio_in_mos": "not-a-number"},
+    {"rtp_audio_in_mos": "nan"},
+    {"rtp_audio_in_mos": "inf"},
+    {"rtp_audio_in_mos": "4.1", "end_epoch": "1e20"},
+    {"rtp_audio_in_mos": "4.1", "end_epoch": "nan"},
+])
+def test_extract_quality_stats_without_mos(variables):
+    assert FreeSwitchService().extract_quality_stats(variables) is None
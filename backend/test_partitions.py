@@ -0,0 +1,114 @@
+from datetime import date
+
+import pytest
+
+from sqlalchemy.dialects import postgresql
+
+from app.services import partitions
+from app.services.partitions import (
+    _drop_partition,
+    add_months,
+    detached_marker,
+    expired_partitions,
+    horizon_error,
+    partition_month,
+    partition_name,
+    retention_cutoff,
+    run_maintenance,
+)
+
+@pytest.mark.parametrize("month, months, expected", [
+    (date(2026, 10, 1), 3, date(2027, 1, 1)),
+    (date(2026, 10, 1), -12, date(2025, 10, 1)),
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 12, 1), 1, date(2027, 1, 1)),
+    (date(2026, 3, 1), 0, date(2026, 3, 1)),
+])
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+def test_partition_name_round_trip():
+    name = partition_name("calls", date(2025, 1, 1))
+    assert name == "calls_y2025m01"
+    assert partition_month("calls", name) == date(2025, 1, 1)
+
+@pytest.mark.parametrize("table, name", [
+    ("calls", "call_logs_y2025m01"),
+    ("call_logs", "calls_y2025m01"),
+    ("calls", "calls_default"),
+    ("calls", "calls_y2025m13"),
+    ("calls", "calls_y2025m1"),
+    ("calls", "calls_y2025m01_old"),
+])
+def test_partition_month_ignores_other_tables(table, name):
+    assert partition_month(table, name) is None
+
+def test_retention_cutoff_keeps_current_month_plus_full_months():
+    assert retention_cutoff(date(2026, 10, 19), 12) == date(2025, 10, 1)
+    assert retention_cutoff(date(2026, 10, 1), 1) == date(2026, 9, 1)
+
+def test_expired_partitions_for_twelve_month_retention():
+    names = [partition_name("calls", add_months(date(2025, 1, 1), offset)) for offset in range(28)]
+    cutoff = retention_cutoff(date(2026, 10, 19), 12)
+
+    expired = expired_partitions("calls", names + ["calls_default", "call_logs_y2020m01"], cutoff)
+
+    # 2025-09 ends on the cutoff and goes; 2025-10 is the oldest month kept
+    assert expired == [partition_name("calls", date(2025, month, 1)) for month in range(1, 10)]
+    assert "calls_y2025m10" not in expired
+
+def test_expired_partitions_with_nothing_old_enough():
+    names = ["call_logs_y2026m09", "call_logs_y2026m10", "call_logs_y2026m11"]
+    assert expired_partitions("call_logs", names, retention_cutoff(date(2026, 10, 19), 1)) == []
+
+class RecordingConnection:
+    dialect = postgresql.dialect()
+
+    def __init__(self):
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+
+def test_drop_partition_marks_before_detaching_and_qualifies_names():
+    conn = RecordingConnection()
+
+    _drop_partition(conn, "calls", "calls_y2025m01", {"schema": "public", "parent_schema": "public", "state": "attached"})
+
+    assert conn.statements == [
+        f"COMMENT ON TABLE public.calls_y2025m01 IS '{detached_marker('calls')}'",
+        "ALTER TABLE public.calls DETACH PARTITION public.calls_y2025m01 CONCURRENTLY",
+        "DROP TABLE public.calls_y2025m01",
+    ]
+
+def test_drop_partition_only_drops_leftover_detached_table():
+    conn = RecordingConnection()
+
+    _drop_partition(conn, "calls", "calls_y2025m01", {"schema": "app", "parent_schema": "app", "state": "detached"})
+
+    assert conn.statements == ["DROP TABLE app.calls_y2025m01"]
+
+def test_horizon_error_when_partitions_run_short():
+    names = ["calls_y2026m10", "calls_y2026m11", "call_logs_y2027m06"]
+
+    assert horizon_error("calls", names, date(2026, 10, 19), 1) is None
+    assert horizon_error("calls", names, date(2026, 10, 19), 2) == (
+        "newest calls partition is calls_y2026m11, expected at least calls_y2026m12"
+    )
+    assert "is none" in horizon_error("call_logs", [], date(2026, 10, 19), 0)
+
+def test_run_maintenance_records_errors(monkeypatch):
+    monkeypatch.setattr(partitions, "maintain_partitions", lambda: {
+        "calls": {"ensured": ["calls_y2026m10"], "dropped": [], "errors": []},
+        "call_logs": {"ensured": [], "dropped": [], "errors": ["lock timeout"]},
+    })
+
+    assert run_maintenance() == ["call_logs: lock timeout"]
+    assert partitions.last_run["errors"] == ["call_logs: lock timeout"]
+
+def test_run_maintenance_reports_unreachable_database(monkeypatch):
+    def unreachable():
+        raise OSError("connection refused")
+    monkeypatch.setattr(partitions, "maintain_partitions", unreachable)
+
+    assert run_maintenance() == ["connection refused"]
@@ -0,0 +1,33 @@
+-- Per-call quality columns and hourly mergeable MOS sketches
+
+ALTER TABLE calls ADD COLUMN IF NOT EXISTS codec VARCHAR(50);
+ALTER TABLE calls ADD COLUMN IF NOT EXISTS quality_score DECIMAL(3,2);
+
+-- One row per hour, codec and destination prefix. The *_sketch columns
+-- hold DDSketches (see app/services/call_quality.py) of MOS, RTP jitter
+-- variance and packet loss rate, so any range can be answered by merging
+-- rows instead of scanning calls.
+CREATE TABLE IF NOT EXISTS call_quality_hourly (
+    bucket_start TIMESTAMP NOT NULL,
+    codec VARCHAR(50) NOT NULL DEFAULT 'unknown',
+    destination VARCHAR(20) NOT NULL DEFAULT 'unknown',
+    mos_sketch JSONB NOT NULL,
+    mos_histogram JSONB NOT NULL,
+    jitter_sketch JSONB NOT NULL,
+    loss_sketch JSONB NOT NULL,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (bucket_start, codec, destination)
+);
+
+CREATE INDEX IF NOT EXISTS idx_call_quality_hourly_codec ON call_quality_hourly(codec, bucket_start);
+CREATE INDEX IF NOT EXISTS idx_call_quality_hourly_destination ON call_quality_hourly(destination, bucket_start);
+
+-- Calls already folded into call_quality_hourly, so redelivered hangup
+-- records are not counted twice
+CREATE TABLE IF NOT EXISTS call_quality_ingested (
+    call_id VARCHAR(100) PRIMARY KEY,
+    ended_at TIMESTAMP NOT NULL,
+    ingested_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_call_quality_ingested_ended_at ON call_quality_ingested(ended_at);
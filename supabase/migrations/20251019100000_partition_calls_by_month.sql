@@ -0,0 +1,140 @@
+-- Range-partition calls and call_logs by month so retention is a
+-- DETACH + DROP of whole partitions instead of a bulk DELETE.
+--
+-- Partitioned tables require every unique constraint to include the
+-- partition key, so calls is now unique on (call_id, start_time) and the
+-- call_logs -> calls(call_id) foreign key is dropped; both tables age out
+-- on the same monthly schedule instead.
+--
+-- There is deliberately no DEFAULT partition: DETACH PARTITION CONCURRENTLY
+-- refuses to run while one exists, and new monthly partitions cannot be
+-- created once it holds rows for their range. A row outside the premade
+-- months fails its insert instead. app.services.partitions keeps the
+-- months ahead created and drops expired ones.
+
+-- Creates the partition holding month_start's month, e.g. calls_y2025m01,
+-- next to its parent. CREATE TABLE ... PARTITION OF would lock the parent
+-- ACCESS EXCLUSIVE and stall every call insert; creating the table on its
+-- own and attaching it only takes SHARE UPDATE EXCLUSIVE on the parent.
+CREATE OR REPLACE FUNCTION create_monthly_partition(parent_table TEXT, month_start DATE)
+RETURNS TEXT AS $$
+DECLARE
+    start_date DATE := date_trunc('month', month_start)::date;
+    partition_name TEXT := format('%s_y%sm%s', parent_table, to_char(start_date, 'YYYY'), to_char(start_date, 'MM'));
+    parent_schema TEXT;
+BEGIN
+    SELECT n.nspname INTO parent_schema
+    FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+    WHERE c.oid = parent_table::regclass;
+
+    IF to_regclass(format('%I.%I', parent_schema, partition_name)) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    -- Do not queue call inserts behind a long wait for the parent lock;
+    -- the next run retries
+    PERFORM set_config('lock_timeout', '5s', true);
+    EXECUTE format(
+        'CREATE TABLE %I.%I (LIKE %I.%I INCLUDING ALL)',
+        parent_schema, partition_name, parent_schema, parent_table
+    );
+    EXECUTE format(
+        'ALTER TABLE %I.%I ATTACH PARTITION %I.%I FOR VALUES FROM (%L) TO (%L)',
+        parent_schema, parent_table, parent_schema, partition_name,
+        start_date, (start_date + INTERVAL '1 month')::date
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Move the existing tables aside, keeping their id sequences
+ALTER TABLE call_logs DROP CONSTRAINT IF EXISTS call_logs_call_id_fkey;
+ALTER TABLE call_logs RENAME TO call_logs_unpartitioned;
+ALTER TABLE calls RENAME TO calls_unpartitioned;
+ALTER INDEX calls_pkey RENAME TO calls_unpartitioned_pkey;
+ALTER INDEX calls_call_id_key RENAME TO calls_unpartitioned_call_id_key;
+ALTER INDEX call_logs_pkey RENAME TO call_logs_unpartitioned_pkey;
+DROP INDEX IF EXISTS idx_calls_user_id;
+DROP INDEX IF EXISTS idx_calls_status;
+DROP INDEX IF EXISTS idx_call_logs_call_id;
+DROP INDEX IF EXISTS idx_call_logs_timestamp;
+ALTER SEQUENCE calls_id_seq OWNED BY NONE;
+ALTER SEQUENCE call_logs_id_seq OWNED BY NONE;
+
+CREATE TABLE calls (
+    id INTEGER NOT NULL DEFAULT nextval('calls_id_seq'),
+    call_id VARCHAR(100) NOT NULL,
+    from_number VARCHAR(20) NOT NULL,
+    to_number VARCHAR(20) NOT NULL,
+    status VARCHAR(20) DEFAULT 'initiated',
+    start_time TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+    end_time TIMESTAMP,
+    duration INTEGER,
+    user_id INTEGER REFERENCES users(id),
+    codec VARCHAR(50),
+    quality_score DECIMAL(3,2),
+    PRIMARY KEY (id, start_time),
+    UNIQUE (call_id, start_time)
+) PARTITION BY RANGE (start_time);
+
+CREATE TABLE call_logs (
+    id INTEGER NOT NULL DEFAULT nextval('call_logs_id_seq'),
+    call_id VARCHAR(100),
+    event_type VARCHAR(50) NOT NULL,
+    event_data JSONB,
+    timestamp TIMESTAMP NOT NULL DEFAULT (now() AT TIME ZONE 'UTC'),
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+ALTER SEQUENCE calls_id_seq OWNED BY calls.id;
+ALTER SEQUENCE call_logs_id_seq OWNED BY call_logs.id;
+
+-- Partitions for every month of existing data plus the next three months.
+-- Existing rows are shifted to UTC below, so pad their range by a day.
+DO $$
+DECLARE
+    parent_table TEXT;
+    first_month DATE;
+    last_month DATE;
+    month_start DATE;
+    today DATE := (now() AT TIME ZONE 'UTC')::date;
+BEGIN
+    FOREACH parent_table IN ARRAY ARRAY['calls', 'call_logs'] LOOP
+        IF parent_table = 'calls' THEN
+            SELECT min(COALESCE(start_time, end_time))::date, max(COALESCE(start_time, end_time))::date INTO first_month, last_month FROM calls_unpartitioned;
+        ELSE
+            SELECT min("timestamp")::date, max("timestamp")::date INTO first_month, last_month FROM call_logs_unpartitioned;
+        END IF;
+        month_start := date_trunc('month', LEAST(COALESCE(first_month - 1, today), today))::date;
+        last_month := GREATEST(COALESCE(last_month + 1, today), (today + INTERVAL '3 months')::date);
+        WHILE month_start <= last_month LOOP
+            PERFORM create_monthly_partition(parent_table, month_start);
+            month_start := (month_start + INTERVAL '1 month')::date;
+        END LOOP;
+    END LOOP;
+END;
+$$;
+
+-- The old CURRENT_TIMESTAMP defaults stored the session's local time; the
+-- new tables hold naive UTC like the API, which compares against utcnow()
+INSERT INTO calls (id, call_id, from_number, to_number, status, start_time, end_time, duration, user_id, codec, quality_score)
+SELECT id, call_id, from_number, to_number, status,
+       COALESCE(start_time, end_time, LOCALTIMESTAMP) AT TIME ZONE current_setting('TimeZone') AT TIME ZONE 'UTC',
+       end_time AT TIME ZONE current_setting('TimeZone') AT TIME ZONE 'UTC',
+       duration, user_id, codec, quality_score
+FROM calls_unpartitioned;
+
+INSERT INTO call_logs (id, call_id, event_type, event_data, timestamp)
+SELECT id, call_id, event_type, event_data,
+       COALESCE("timestamp", LOCALTIMESTAMP) AT TIME ZONE current_setting('TimeZone') AT TIME ZONE 'UTC'
+FROM call_logs_unpartitioned;
+
+DROP TABLE call_logs_unpartitioned;
+DROP TABLE calls_unpartitioned;
+
+-- Indexes on the parents are created on every partition, current and future
+CREATE INDEX IF NOT EXISTS idx_calls_user_id ON calls(user_id, start_time);
+CREATE INDEX IF NOT EXISTS idx_calls_status ON calls(status);
+CREATE INDEX IF NOT EXISTS idx_calls_call_id ON calls(call_id);
+CREATE INDEX IF NOT EXISTS idx_call_logs_call_id ON call_logs(call_id);
+CREATE INDEX IF NOT EXISTS idx_call_logs_timestamp ON call_logs(timestamp);